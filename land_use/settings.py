@@ -35,6 +35,20 @@ ALLOWED_HOSTS = os.getenv('ALLOWED_HOSTS', '').split(',') if os.getenv('ALLOWED_
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploads are multi-megabyte aerial images: stream every upload straight to
+# a temporary file in large chunks instead of buffering small ones in memory,
+# and allow request bodies big enough for two full-size photos
+FILE_UPLOAD_HANDLERS = ['landapp.upload_handlers.LargeChunkTemporaryFileUploadHandler']
+FILE_UPLOAD_MAX_MEMORY_SIZE = 0
+DATA_UPLOAD_MAX_MEMORY_SIZE = 200 * 1024 * 1024
+
+# Offload delivery of processed compare results to the front-end server by
+# setting RESULT_SENDFILE_HEADER (e.g. 'X-Accel-Redirect' for nginx, with
+# a matching internal location aliasing MEDIA_ROOT/compare_cache/). When
+# unset, Django streams the files itself via FileResponse.
+RESULT_SENDFILE_HEADER = os.getenv('RESULT_SENDFILE_HEADER', '')
+RESULT_SENDFILE_PREFIX = os.getenv('RESULT_SENDFILE_PREFIX', '/compare-results/')
+
 
 
 # Application definition
@@ -86,6 +100,11 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Keep connections open across requests so the light per-view SQL
+        # doesn't pay connection setup every time; health checks drop dead
+        # connections before reuse
+        'CONN_MAX_AGE': int(os.getenv('CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
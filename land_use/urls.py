@@ -24,6 +24,8 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('', views.upload_images, name='upload'),
     path('compare/<int:img1_id>/<int:img2_id>/', views.compare_images, name='compare'),
+    path('compare/<int:img1_id>/<int:img2_id>/status/', views.compare_status, name='compare_status'),
+    path('compare/<int:img1_id>/<int:img2_id>/result/', views.compare_result, name='compare_result'),
 ]
 
 if settings.DEBUG:
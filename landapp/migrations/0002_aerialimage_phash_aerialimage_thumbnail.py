@@ -0,0 +1,23 @@
+# Generated by Django 5.2.17 on 2026-08-30 22:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('landapp', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='aerialimage',
+            name='phash',
+            field=models.CharField(blank=True, default='', max_length=16),
+        ),
+        migrations.AddField(
+            model_name='aerialimage',
+            name='thumbnail',
+            field=models.ImageField(blank=True, null=True, upload_to='thumbnails/'),
+        ),
+    ]
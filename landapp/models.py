@@ -1,5 +1,10 @@
+import os
+
+from django.core.files.base import ContentFile
 from django.db import models
 
+from .image_utils import thumbnail_and_phash
+
 class AerialImage(models.Model):
     """
     Represents an aerial image uploaded by the user.
@@ -7,11 +12,46 @@ class AerialImage(models.Model):
     Attributes:
         title (str): The title or name of the image.
         image (ImageField): The uploaded image file, stored in the 'uploads/' directory.
+        thumbnail (ImageField): Display-sized copy generated at upload time,
+            stored in the 'thumbnails/' directory. Comparisons run on this
+            instead of re-decoding the full-resolution original.
+        phash (str): 64-bit perceptual hash of the image as 16 hex characters.
         uploaded_at (DateTimeField): The timestamp when the image was uploaded.
     """
     title = models.CharField(max_length=100)
     image = models.ImageField(upload_to='uploads/')
+    thumbnail = models.ImageField(upload_to='thumbnails/', blank=True, null=True)
+    phash = models.CharField(max_length=16, blank=True, default='')
     uploaded_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return self.title
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        if self.image and not self.thumbnail:
+            self._build_thumbnail()
+
+    def _build_thumbnail(self):
+        """
+        Generate and store the thumbnail and perceptual hash for this image.
+
+        Runs once per upload, right after the original file is saved. Images
+        that fail to decode (e.g. corrupt uploads) are left without a
+        thumbnail, and comparisons fall back to the original file.
+        """
+        self.image.open('rb')
+        try:
+            data = self.image.read()
+        finally:
+            self.image.close()
+
+        result = thumbnail_and_phash(data)
+        if result is None:
+            return
+        thumb_bytes, phash = result
+
+        self.phash = phash
+        base = os.path.splitext(os.path.basename(self.image.name))[0]
+        self.thumbnail.save(base + '_thumb.jpg', ContentFile(thumb_bytes), save=False)
+        super().save(update_fields=['thumbnail', 'phash'])
@@ -64,6 +64,45 @@ class ImageUploadFormTest(TestCase):
         self.assertFalse(form.is_valid())
         self.assertIn('title', form.errors)
 
+    def test_form_with_undecodable_image(self):
+        """Test form with a file that is not a decodable image."""
+        bad_image = SimpleUploadedFile(
+            name='not_an_image.jpg',
+            content=b'this is not image data',
+            content_type='image/jpeg'
+        )
+        form_data = {
+            'title': 'Test Image',
+        }
+        form_files = {
+            'image': bad_image
+        }
+        form = ImageUploadForm(form_data, form_files)
+        self.assertFalse(form.is_valid())
+        self.assertIn('image', form.errors)
+
+    def test_form_with_tiny_image(self):
+        """Test form with an image too small for the reduced decode probe."""
+        # Under 8px per side the 1/8 decode fails; the full-size fallback
+        # must still accept the upload
+        image = Image.new('RGB', (4, 4), color='red')
+        image_io = BytesIO()
+        image.save(image_io, format='PNG')
+
+        tiny_image = SimpleUploadedFile(
+            name='tiny_image.png',
+            content=image_io.getvalue(),
+            content_type='image/png'
+        )
+        form_data = {
+            'title': 'Test Image',
+        }
+        form_files = {
+            'image': tiny_image
+        }
+        form = ImageUploadForm(form_data, form_files)
+        self.assertTrue(form.is_valid())
+
     def test_form_save(self):
         """Test form save method."""
         # Create a new test image since the previous one was consumed
@@ -97,4 +136,7 @@ class ImageUploadFormTest(TestCase):
         for image in AerialImage.objects.all():
             if image.image:
                 if os.path.isfile(image.image.path):
-                    os.remove(image.image.path) 
\ No newline at end of file
+                    os.remove(image.image.path)
+            if image.thumbnail:
+                if os.path.isfile(image.thumbnail.path):
+                    os.remove(image.thumbnail.path)
\ No newline at end of file
@@ -43,6 +43,36 @@ class AerialImageModelTest(TestCase):
         with self.assertRaises(ValidationError):
             image.full_clean()
 
+    def test_thumbnail_and_phash_generated(self):
+        """Test that a valid upload gets a thumbnail and perceptual hash."""
+        from PIL import Image
+        from io import BytesIO
+
+        pil_image = Image.new('RGB', (100, 100), color='red')
+        image_io = BytesIO()
+        pil_image.save(image_io, format='JPEG')
+
+        image = AerialImage.objects.create(
+            title='Test Image',
+            image=SimpleUploadedFile(
+                name='test_thumb_image.jpg',
+                content=image_io.getvalue(),
+                content_type='image/jpeg'
+            )
+        )
+        self.assertTrue(image.thumbnail)
+        self.assertTrue(os.path.exists(image.thumbnail.path))
+        self.assertEqual(len(image.phash), 16)
+
+    def test_thumbnail_skipped_for_undecodable_image(self):
+        """Test that an undecodable upload is saved without a thumbnail."""
+        image = AerialImage.objects.create(
+            title='Test Image',
+            image=self.test_image  # Empty content cannot be decoded
+        )
+        self.assertFalse(image.thumbnail)
+        self.assertEqual(image.phash, '')
+
     def test_string_representation(self):
         """Test the string representation of the model."""
         image = AerialImage.objects.create(
@@ -57,4 +87,7 @@ class AerialImageModelTest(TestCase):
         for image in AerialImage.objects.all():
             if image.image:
                 if os.path.isfile(image.image.path):
-                    os.remove(image.image.path) 
\ No newline at end of file
+                    os.remove(image.image.path)
+            if image.thumbnail:
+                if os.path.isfile(image.thumbnail.path):
+                    os.remove(image.thumbnail.path)
\ No newline at end of file
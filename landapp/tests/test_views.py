@@ -3,6 +3,8 @@ from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
 from landapp.models import AerialImage
 import os
+import time
+from unittest import mock
 from django.conf import settings
 from PIL import Image
 from io import BytesIO
@@ -165,7 +167,191 @@ class ViewsTest(TestCase):
         self.assertTemplateUsed(response, 'compare.html')
         self.assertIn('img1', response.context)
         self.assertIn('img2', response.context)
-        self.assertIn('result_image', response.context)
+        self.assertIn('result_ready', response.context)
+
+    def test_compare_page_query_count(self):
+        """Test that the compare page hits the database exactly once."""
+        # Create a test image
+        image = Image.new('RGB', (100, 100), color='red')
+        image_io = BytesIO()
+        image.save(image_io, format='JPEG')
+
+        img1 = AerialImage.objects.create(
+            title='Image 1',
+            image=SimpleUploadedFile(
+                name='test_count_image.jpg',
+                content=image_io.getvalue(),
+                content_type='image/jpeg'
+            )
+        )
+        img2 = AerialImage.objects.create(
+            title='Image 2',
+            image=SimpleUploadedFile(
+                name='test_count_image2.jpg',
+                content=image_io.getvalue(),
+                content_type='image/jpeg'
+            )
+        )
+
+        # Both rows come from the single in_bulk query; template rendering
+        # must not add lazy follow-up queries
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                reverse('compare', args=[img1.id, img2.id])
+            )
+        self.assertEqual(response.status_code, 200)
+
+    def test_compare_status_endpoint(self):
+        """Test that the status endpoint reports the processed result."""
+        # Create a test image
+        image = Image.new('RGB', (100, 100), color='red')
+        image_io = BytesIO()
+        image.save(image_io, format='JPEG')
+
+        test_image = SimpleUploadedFile(
+            name='test_status_image.jpg',
+            content=image_io.getvalue(),
+            content_type='image/jpeg'
+        )
+
+        img1 = AerialImage.objects.create(
+            title='Image 1',
+            image=test_image
+        )
+
+        image_io.seek(0)
+        test_image2 = SimpleUploadedFile(
+            name='test_status_image2.jpg',
+            content=image_io.getvalue(),
+            content_type='image/jpeg'
+        )
+
+        img2 = AerialImage.objects.create(
+            title='Image 2',
+            image=test_image2
+        )
+
+        # First visit renders a pending page and kicks off the background job
+        response = self.client.get(
+            reverse('compare', args=[img1.id, img2.id])
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTemplateUsed(response, 'compare.html')
+
+        # Poll the status endpoint until the job finishes
+        status_url = reverse('compare_status', args=[img1.id, img2.id])
+        data = {'ready': False}
+        for _ in range(100):
+            data = self.client.get(status_url).json()
+            if data['ready']:
+                break
+            time.sleep(0.1)
+
+        self.assertTrue(data['ready'])
+        self.assertTrue(data['result_url'])
+
+        # The result URL serves the stored PNG
+        response = self.client.get(data['result_url'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/png')
+
+        # A repeat visit now references the stored result directly
+        response = self.client.get(
+            reverse('compare', args=[img1.id, img2.id])
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['result_ready'])
+
+    def test_compare_status_reports_failure(self):
+        """Test that the status endpoint reports a failed background job."""
+        # Create a test image
+        image = Image.new('RGB', (100, 100), color='red')
+        image_io = BytesIO()
+        image.save(image_io, format='JPEG')
+
+        img1 = AerialImage.objects.create(
+            title='Image 1',
+            image=SimpleUploadedFile(
+                name='test_failed_image.jpg',
+                content=image_io.getvalue(),
+                content_type='image/jpeg'
+            )
+        )
+        img2 = AerialImage.objects.create(
+            title='Image 2',
+            image=SimpleUploadedFile(
+                name='test_failed_image2.jpg',
+                content=image_io.getvalue(),
+                content_type='image/jpeg'
+            )
+        )
+
+        status_url = reverse('compare_status', args=[img1.id, img2.id])
+        data = {}
+        with mock.patch('landapp.views.process_images',
+                        side_effect=ValueError('pipeline broke')):
+            with self.assertLogs('landapp.views', level='ERROR'):
+                # Kick off the job with the broken pipeline and poll until
+                # the failure surfaces
+                self.client.get(reverse('compare', args=[img1.id, img2.id]))
+                for _ in range(100):
+                    data = self.client.get(status_url).json()
+                    if data.get('failed') or data['ready']:
+                        break
+                    time.sleep(0.1)
+
+        self.assertEqual(data, {'ready': False, 'failed': True})
+        # The failure is sticky for the poller: no automatic resubmit
+        self.assertEqual(self.client.get(status_url).json(),
+                         {'ready': False, 'failed': True})
+
+    def test_compare_page_conditional_get(self):
+        """Test that an unchanged compare page returns 304 Not Modified."""
+        # Create a test image
+        image = Image.new('RGB', (100, 100), color='red')
+        image_io = BytesIO()
+        image.save(image_io, format='JPEG')
+
+        img1 = AerialImage.objects.create(
+            title='Image 1',
+            image=SimpleUploadedFile(
+                name='test_etag_image.jpg',
+                content=image_io.getvalue(),
+                content_type='image/jpeg'
+            )
+        )
+        img2 = AerialImage.objects.create(
+            title='Image 2',
+            image=SimpleUploadedFile(
+                name='test_etag_image2.jpg',
+                content=image_io.getvalue(),
+                content_type='image/jpeg'
+            )
+        )
+
+        # Visit once and wait for processing so the ETag stops changing
+        compare_url = reverse('compare', args=[img1.id, img2.id])
+        self.client.get(compare_url)
+        status_url = reverse('compare_status', args=[img1.id, img2.id])
+        for _ in range(100):
+            if self.client.get(status_url).json()['ready']:
+                break
+            time.sleep(0.1)
+
+        response = self.client.get(compare_url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        # A refresh with the same ETag short-circuits before rendering
+        response = self.client.get(compare_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_compare_status_nonexistent_images(self):
+        """Test status endpoint with nonexistent image IDs."""
+        response = self.client.get(
+            reverse('compare_status', args=[999, 1000])
+        )
+        self.assertEqual(response.status_code, 404)
 
     def test_compare_page_nonexistent_images(self):
         """Test compare page with nonexistent image IDs."""
@@ -180,4 +366,16 @@ class ViewsTest(TestCase):
         for image in AerialImage.objects.all():
             if image.image:
                 if os.path.isfile(image.image.path):
-                    os.remove(image.image.path) 
\ No newline at end of file
+                    os.remove(image.image.path)
+            if image.thumbnail:
+                if os.path.isfile(image.thumbnail.path):
+                    os.remove(image.thumbnail.path)
+        # Remove result PNGs written by the background jobs
+        cache_dir = os.path.join(settings.MEDIA_ROOT, 'compare_cache')
+        if os.path.isdir(cache_dir):
+            for name in os.listdir(cache_dir):
+                try:
+                    os.remove(os.path.join(cache_dir, name))
+                except OSError:
+                    # A background job may still be finishing its write
+                    pass
\ No newline at end of file
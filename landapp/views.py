@@ -1,11 +1,57 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.shortcuts import render, redirect
+from django.urls import reverse
+from django.views.decorators.http import condition
 from .forms import ImageUploadForm
 from .models import AerialImage
 from .image_utils import process_images
+import hashlib
+import logging
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from django.conf import settings
 
-def upload_images(request):
+logger = logging.getLogger(__name__)
+
+# Pool running the CV pipeline off the request thread, plus a registry of
+# in-flight jobs so the same pair is never processed twice concurrently,
+# and one of failed keys so the status endpoint can report the failure
+# instead of polling forever
+_RESULT_POOL = ThreadPoolExecutor(max_workers=2)
+_PENDING_JOBS = {}
+_FAILED_JOBS = set()
+_JOBS_LOCK = threading.Lock()
+
+def _validate_and_save_pair(request):
+    """
+    Bind and validate both upload forms from the request, saving them if valid.
+
+    Runs in a worker thread via sync_to_async. The first access of
+    request.POST/request.FILES here is what parses the multipart body and
+    streams the uploads to temp files, so that work - along with validation
+    (which decodes the images) and saving (file writes, thumbnails, DB
+    inserts) - stays off the event loop.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+
+    Returns:
+        tuple: (form1, form2, saved) where saved is (img1, img2) on success
+        or None if either form is invalid.
+    """
+    form1 = ImageUploadForm(request.POST, request.FILES, prefix="img1")
+    form2 = ImageUploadForm(request.POST, request.FILES, prefix="img2")
+    if not (form1.is_valid() and form2.is_valid()):
+        return form1, form2, None
+    # One transaction for both rows: a single commit/fsync, and no
+    # half-uploaded pair if the second save fails
+    with transaction.atomic():
+        return form1, form2, (form1.save(), form2.save())
+
+async def upload_images(request):
     """
     Handle the upload of two images via a form.
 
@@ -13,6 +59,10 @@ def upload_images(request):
     If both forms are valid, redirect to the 'compare' view with the IDs of the uploaded images.
     If the request method is GET, render the upload form.
 
+    Async view: under an ASGI server, the blocking parse/validate/save work
+    is pushed to a thread so one worker can multiplex many concurrent uploads
+    instead of being tied up for the duration of each request body.
+
     Args:
         request (HttpRequest): The HTTP request object.
 
@@ -20,22 +70,196 @@ def upload_images(request):
         HttpResponse: The rendered upload page or a redirect to the 'compare' view.
     """
     if request.method == 'POST':
-        form1 = ImageUploadForm(request.POST, request.FILES, prefix="img1")
-        form2 = ImageUploadForm(request.POST, request.FILES, prefix="img2")
-        if form1.is_valid() and form2.is_valid():
-            img1 = form1.save()
-            img2 = form2.save()
+        form1, form2, saved = await sync_to_async(_validate_and_save_pair)(request)
+        if saved is not None:
+            img1, img2 = saved
             return redirect('compare', img1_id=img1.id, img2_id=img2.id)
     else:
         form1 = ImageUploadForm(prefix="img1")
         form2 = ImageUploadForm(prefix="img2")
     return render(request, 'upload.html', {'form1': form1, 'form2': form2})
 
+def _result_cache_key(img1_id, img2_id, img1_path, img2_path):
+    """
+    Build the cache key for a processed compare result.
+
+    Args:
+        img1_id (int): The ID of the first image.
+        img2_id (int): The ID of the second image.
+        img1_path (str): Absolute path of the first image file.
+        img2_path (str): Absolute path of the second image file.
+
+    Returns:
+        str: Cache key combining the image IDs and file modification times.
+    """
+    def mtime(path):
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return 0
+    return 'landapp:compare:{}:{}:{}:{}'.format(
+        img1_id, img2_id, mtime(img1_path), mtime(img2_path))
+
+def _result_file(cache_key):
+    """
+    Map a result cache key to its PNG file under MEDIA_ROOT/compare_cache.
+
+    Args:
+        cache_key (str): Cache key for the processed result.
+
+    Returns:
+        str: Absolute path of the result PNG for this key.
+    """
+    digest = hashlib.blake2b(cache_key.encode(), digest_size=16).hexdigest()
+    return os.path.join(settings.MEDIA_ROOT, 'compare_cache', digest + '.png')
+
+def _read_bytes(path):
+    """
+    Read a file's bytes, returning empty bytes if it is missing.
+
+    Args:
+        path (str): Path to the file.
+
+    Returns:
+        bytes: File contents, or b'' when the file cannot be read.
+    """
+    try:
+        with open(path, 'rb') as f:
+            return f.read()
+    except OSError:
+        return b''
+
+def _process_and_store(cache_key, img1_path, img2_path):
+    """
+    Background job body: run the CV pipeline and write the result PNG to disk.
+
+    The file is written to a temporary name and renamed into place, so readers
+    never observe a partially written image. Failures are logged and recorded
+    in _FAILED_JOBS so the status endpoint reports them rather than leaving
+    the page polling indefinitely.
+
+    Args:
+        cache_key (str): Cache key for the processed result.
+        img1_path (str): Absolute path of the first image file.
+        img2_path (str): Absolute path of the second image file.
+    """
+    try:
+        # Hand the raw bytes to the pipeline; it decodes them in-memory with
+        # cv2.imdecode, avoiding a second filesystem round-trip inside cv2
+        png_bytes = process_images(_read_bytes(img1_path), _read_bytes(img2_path))
+        result_path = _result_file(cache_key)
+        os.makedirs(os.path.dirname(result_path), exist_ok=True)
+        tmp_path = result_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(png_bytes)
+        os.replace(tmp_path, result_path)
+    except Exception:
+        logger.exception('Comparison job failed for %s and %s',
+                         img1_path, img2_path)
+        with _JOBS_LOCK:
+            _FAILED_JOBS.add(cache_key)
+    finally:
+        with _JOBS_LOCK:
+            _PENDING_JOBS.pop(cache_key, None)
+
+def _ensure_result_job(cache_key, img1_path, img2_path):
+    """
+    Submit a processing job for the pair unless one is already in flight.
+
+    Resubmitting clears any recorded failure for the pair, so a fresh page
+    visit retries a previously failed comparison.
+
+    Args:
+        cache_key (str): Cache key for the processed result.
+        img1_path (str): Absolute path of the first image file.
+        img2_path (str): Absolute path of the second image file.
+    """
+    with _JOBS_LOCK:
+        _FAILED_JOBS.discard(cache_key)
+        if cache_key not in _PENDING_JOBS:
+            _PENDING_JOBS[cache_key] = _RESULT_POOL.submit(
+                _process_and_store, cache_key, img1_path, img2_path)
+
+def _get_image_pair(img1_id, img2_id):
+    """
+    Fetch both images and their file paths, or raise Http404.
+
+    Args:
+        img1_id (int): The ID of the first image.
+        img2_id (int): The ID of the second image.
+
+    Returns:
+        tuple: (img1, img2, img1_path, img2_path)
+    """
+    # Fetch both rows with a single WHERE id IN (...) query, shipping only
+    # the columns the compare pages use (title for display, the file fields
+    # for paths and URLs)
+    images = (AerialImage.objects.only('title', 'image', 'thumbnail')
+              .in_bulk([img1_id, img2_id]))
+    try:
+        img1, img2 = images[img1_id], images[img2_id]
+    except KeyError:
+        raise Http404("Aerial image does not exist")
+
+    # Compare on the display-sized thumbnail precomputed at upload time,
+    # falling back to the original for rows that predate thumbnails or
+    # whose upload didn't decode
+    def compare_path(img):
+        source = img.thumbnail if img.thumbnail else img.image
+        return source.path
+
+    return img1, img2, compare_path(img1), compare_path(img2)
+
+def _compare_pair(request, img1_id, img2_id):
+    """
+    Fetch the image pair once per request, memoized on the request object.
+
+    The condition() decorator runs the ETag function and then the view on the
+    same request; caching the lookup here keeps that at a single query.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+        img1_id (int): The ID of the first image.
+        img2_id (int): The ID of the second image.
+
+    Returns:
+        tuple: (img1, img2, img1_path, img2_path)
+    """
+    if not hasattr(request, '_compare_pair'):
+        request._compare_pair = _get_image_pair(img1_id, img2_id)
+    return request._compare_pair
+
+def _compare_etag(request, img1_id, img2_id):
+    """
+    Compute the ETag for the compare pages of a pair of images.
+
+    Derived from the image IDs, their file modification times and whether the
+    processed result exists, so a browser refresh of an unchanged pair gets a
+    304 Not Modified without re-rendering anything.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+        img1_id (int): The ID of the first image.
+        img2_id (int): The ID of the second image.
+
+    Returns:
+        str: Hex digest identifying the current state of the pair.
+    """
+    _, _, img1_path, img2_path = _compare_pair(request, img1_id, img2_id)
+    cache_key = _result_cache_key(img1_id, img2_id, img1_path, img2_path)
+    ready = os.path.exists(_result_file(cache_key))
+    return hashlib.md5('{}:{}'.format(cache_key, ready).encode()).hexdigest()
+
+@condition(etag_func=_compare_etag)
 def compare_images(request, img1_id, img2_id):
     """
     Compare two uploaded images and display the result.
 
-    Retrieve the images by their IDs, process them, and render the comparison result.
+    Retrieve the images by their IDs and render the comparison page. A
+    previously computed result is referenced by URL directly; otherwise
+    processing is dispatched to a background worker and the page polls the
+    status endpoint until the result is ready, so the request thread is never
+    blocked on the CV pipeline.
 
     Args:
         request (HttpRequest): The HTTP request object.
@@ -43,22 +267,92 @@ def compare_images(request, img1_id, img2_id):
         img2_id (int): The ID of the second image.
 
     Returns:
-        HttpResponse: The rendered comparison page with the images and the result.
-    """
-    img1 = get_object_or_404(AerialImage, id=img1_id)
-    img2 = get_object_or_404(AerialImage, id=img2_id)
-    
-    # Get absolute paths of the images
-    img1_path = os.path.join(settings.MEDIA_ROOT, str(img1.image))
-    img2_path = os.path.join(settings.MEDIA_ROOT, str(img2.image))
-    
-    # Process the images
-    result_image = process_images(img1_path, img2_path)
-    
+        HttpResponse: The rendered comparison page with the images and the
+        result (or a pending state while it is being computed).
+    """
+    img1, img2, img1_path, img2_path = _compare_pair(request, img1_id, img2_id)
+
+    # Repeat compares of the same pair reuse the stored PNG; the file mtimes
+    # in the key invalidate it if either upload is ever replaced on disk
+    cache_key = _result_cache_key(img1_id, img2_id, img1_path, img2_path)
+    result_ready = os.path.exists(_result_file(cache_key))
+    if not result_ready:
+        _ensure_result_job(cache_key, img1_path, img2_path)
+
     context = {
         'img1': img1,
         'img2': img2,
-        'result_image': result_image
+        'result_ready': result_ready
     }
-    
+
     return render(request, 'compare.html', context)
+
+def compare_status(request, img1_id, img2_id):
+    """
+    Report whether the processed result for a pair of images is ready.
+
+    Polled by the compare page while the background job runs. Resubmits the
+    job if the result is missing and nothing is in flight (e.g. after a cache
+    eviction or worker restart), but not after a recorded failure - retrying
+    a persistently failing job here would just loop; a fresh page visit
+    retries it instead.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+        img1_id (int): The ID of the first image.
+        img2_id (int): The ID of the second image.
+
+    Returns:
+        JsonResponse: {'ready': False} while processing, {'ready': False,
+        'failed': True} if the job raised, or
+        {'ready': True, 'result_url': <URL of the result PNG>} once done.
+    """
+    _, _, img1_path, img2_path = _get_image_pair(img1_id, img2_id)
+
+    cache_key = _result_cache_key(img1_id, img2_id, img1_path, img2_path)
+    if not os.path.exists(_result_file(cache_key)):
+        with _JOBS_LOCK:
+            failed = cache_key in _FAILED_JOBS
+        if failed:
+            return JsonResponse({'ready': False, 'failed': True})
+        _ensure_result_job(cache_key, img1_path, img2_path)
+        return JsonResponse({'ready': False})
+    return JsonResponse({
+        'ready': True,
+        'result_url': reverse('compare_result', args=[img1_id, img2_id]),
+    })
+
+@condition(etag_func=_compare_etag)
+def compare_result(request, img1_id, img2_id):
+    """
+    Serve the processed result PNG for a pair of images.
+
+    Streams the stored file with FileResponse, or - when
+    RESULT_SENDFILE_HEADER is configured - hands delivery to the front-end
+    server (e.g. nginx X-Accel-Redirect) so the bytes never pass through
+    Python.
+
+    Args:
+        request (HttpRequest): The HTTP request object.
+        img1_id (int): The ID of the first image.
+        img2_id (int): The ID of the second image.
+
+    Returns:
+        HttpResponse: The result PNG, or 404 if it has not been computed yet.
+    """
+    _, _, img1_path, img2_path = _compare_pair(request, img1_id, img2_id)
+
+    cache_key = _result_cache_key(img1_id, img2_id, img1_path, img2_path)
+    result_path = _result_file(cache_key)
+    if not os.path.exists(result_path):
+        # Recompute evicted results so a client retrying this URL converges
+        _ensure_result_job(cache_key, img1_path, img2_path)
+        raise Http404("Comparison result not ready")
+
+    sendfile_header = getattr(settings, 'RESULT_SENDFILE_HEADER', '')
+    if sendfile_header:
+        response = HttpResponse(content_type='image/png')
+        response[sendfile_header] = (settings.RESULT_SENDFILE_PREFIX
+                                     + os.path.basename(result_path))
+        return response
+    return FileResponse(open(result_path, 'rb'), content_type='image/png')